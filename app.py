@@ -1,57 +1,354 @@
 from flask import Flask, request, jsonify
 import requests
-import openai
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import urllib3
+from requests_toolbelt import MultipartEncoder
+import diskcache
+import mimetypes
+import io
 import os
 import tempfile
+import queue
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 import re
 import subprocess
+import shutil
+import time
 
 app = Flask(__name__)
 
+# Matches /file/d/<id> and ?id=<id> / &id=<id> Drive URLs (including
+# /open?id=<id>) in one scan
+GDRIVE_ID_RE = re.compile(r'(?:/file/d/|[?&]id=)([a-zA-Z0-9_-]+)')
+
+# Shared HTTP session so Drive downloads and webhooks reuse pooled
+# keep-alive connections instead of paying a TLS handshake per call
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+)
+SESSION.mount('https://', _adapter)
+SESSION.mount('http://', _adapter)
+
+# Large files on the download path are fetched as parallel Range requests
+# so throughput isn't capped by a single TCP connection's window. The
+# download path is only the fallback when streaming into ffmpeg fails;
+# the streamed fetch feeds a pipe in order and uses a single connection
+DOWNLOAD_CONNECTIONS = int(os.environ.get('DOWNLOAD_CONNECTIONS', 4))
+RANGE_PART_SIZE = 4 * 1024 * 1024
+
+# Videos larger than this are rejected, up front when the HEAD probe reports
+# a size and otherwise as soon as that many bytes have been read
+MAX_VIDEO_BYTES = int(os.environ.get('MAX_VIDEO_BYTES', 2 * 1024 * 1024 * 1024))
+
+# Attempts per download stream (a Range part, the single-stream download or
+# the ffmpeg feed); a retry resumes with a Range request from the last byte
+DOWNLOAD_ATTEMPTS = 5
+
+# Errors from a dropped or stalled connection, worth retrying
+DOWNLOAD_ERRORS = (requests.ConnectionError, requests.Timeout, urllib3.exceptions.HTTPError)
+
+# Audio files and segments go on tmpfs when it has room, since they only
+# live for the duration of one job and overlayfs /tmp in containers is slow.
+# Videos stay in the default temp directory: they can be gigabytes, and
+# tmpfs pages count against RAM for every concurrent job
+TMPFS_DIR = '/dev/shm'
+TMPFS_MIN_FREE_BYTES = 256 * 1024 * 1024
+
+# Finished transcripts keyed by Drive file ID, so retries of the same file
+# skip the whole pipeline. Kept on disk so every gunicorn process shares it;
+# diskcache is safe across processes and threads
+TRANSCRIPT_CACHE = diskcache.Cache(os.environ.get(
+    'TRANSCRIPT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'transcript-cache')
+))
+TRANSCRIPT_CACHE_TTL = int(os.environ.get('TRANSCRIPT_CACHE_TTL', 86400))
+
+# Bounded pool for background jobs so a burst of requests can't start an
+# unbounded number of concurrent downloads and ffmpeg processes
+WORKERS = int(os.environ.get('WORKERS', 4))
+EXECUTOR = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='video-worker')
+
+# Jobs accepted but not yet finished (running or waiting for a worker);
+# requests beyond this are rejected with 429 instead of piling up
+PENDING_JOBS = queue.Queue(maxsize=int(os.environ.get('MAX_PENDING_JOBS', WORKERS * 4)))
+
+# Read/write size for streaming downloads; large enough that per-chunk
+# Python and syscall overhead stops dominating on multi-MB videos
+CHUNK_SIZE = 1024 * 1024
+
+# Keep ffmpeg quiet unless something goes wrong, so its stderr stays small
+FFMPEG_CMD = ['ffmpeg', '-loglevel', 'error', '-nostats']
+
+# ffmpeg output options shared by the streaming and file-based conversions.
+# Whisper resamples to 16 kHz mono internally, so anything richer is just
+# extra bytes to encode and upload. Opus in Ogg encodes faster than LAME and
+# holds up better at speech bitrates
+AUDIO_BITRATE = 24000
+AUDIO_FORMAT = 'ogg'
+AUDIO_ARGS = [
+    '-vn',  # No video
+    '-ac', '1',
+    '-ar', '16000',
+    '-c:a', 'libopus',
+    '-b:a', str(AUDIO_BITRATE),
+    '-application', 'voip',  # Tune the encoder for speech
+    '-threads', '0',
+]
+
+# Audio codecs Whisper accepts as-is, mapped to the container to remux them
+# into. Remuxing needs a seekable file to probe, so it only applies once the
+# video has been downloaded (the fallback when streaming fails); streamed
+# input is always encoded. PCM/WAV is left out on purpose: uncompressed
+# audio blows through the upload limit and is cheaper to encode than to send
+COPY_CODECS = {
+    'aac': '.m4a',
+    'mp3': '.mp3',
+    'opus': '.ogg',
+    'vorbis': '.ogg',
+    'flac': '.flac',
+}
+
+# Whisper API endpoint and upload limit
+WHISPER_URL = 'https://api.openai.com/v1/audio/transcriptions'
+WHISPER_MAX_BYTES = 25 * 1024 * 1024
+
+# Audio longer than one segment is split and the segments are transcribed
+# concurrently, since Whisper latency grows with audio length
+SEGMENT_SECONDS = 600
+WHISPER_CONNECTIONS = int(os.environ.get('WHISPER_CONNECTIONS', 4))
+
+# Streamed audio up to one segment's worth is uploaded straight from memory;
+# anything longer is spilled to disk so it can be segmented
+MAX_IN_MEMORY_AUDIO_BYTES = SEGMENT_SECONDS * AUDIO_BITRATE // 8
+
+# Streamed output smaller than this is just Ogg/Opus headers, meaning
+# ffmpeg decoded nothing from the pipe
+MIN_AUDIO_BYTES = 1024
+
 def extract_google_drive_file_id(url):
     """Extract file ID from Google Drive URL"""
-    patterns = [
-        r'/file/d/([a-zA-Z0-9-_]+)',
-        r'id=([a-zA-Z0-9-_]+)',
-        r'/open\?id=([a-zA-Z0-9-_]+)'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
+    match = GDRIVE_ID_RE.search(url)
+    return match.group(1) if match else None
+
+def get_temp_dir():
+    """Return tmpfs if it's usable with enough free space, else None for the system default"""
+    try:
+        if os.access(TMPFS_DIR, os.W_OK) and shutil.disk_usage(TMPFS_DIR).free >= TMPFS_MIN_FREE_BYTES:
+            return TMPFS_DIR
+    except OSError:
+        pass
     return None
 
+def check_video_size(size):
+    """Raise if a video of this many bytes is over MAX_VIDEO_BYTES"""
+    if size > MAX_VIDEO_BYTES:
+        raise ValueError(f"Video too large: {size / (1024*1024):.1f}MB (max {MAX_VIDEO_BYTES / (1024*1024):.0f}MB)")
+
+class SizeLimitedReader:
+    """Wrap a response stream, counting bytes read and enforcing MAX_VIDEO_BYTES"""
+    
+    def __init__(self, raw, total=0):
+        self.raw = raw
+        self.total = total
+    
+    def read(self, size=-1):
+        chunk = self.raw.read(size)
+        self.total += len(chunk)
+        check_video_size(self.total)
+        return chunk
+
 def get_download_url(file_id):
     """Convert Google Drive file ID to direct download URL"""
     return f"https://drive.google.com/uc?export=download&id={file_id}"
 
-def download_file(url, file_path):
-    """Download file from URL to local path"""
-    response = requests.get(url, stream=True, timeout=300)
-    response.raise_for_status()
+def probe_download(url):
+    """Resolve redirects and return (final_url, size, supports_ranges)"""
+    try:
+        response = SESSION.head(url, headers={
+            'Accept-Encoding': 'identity',  # Content-Length must be the file size
+        }, allow_redirects=True, timeout=30)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"HEAD request failed: {str(e)}")
+        return url, 0, False
+    
+    size = int(response.headers.get('Content-Length', 0))
+    if not size:
+        print("HEAD response has no Content-Length, checking size while downloading")
+    supports_ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+    return response.url, size, supports_ranges
+
+def download_range(url, fd, start, end):
+    """Download bytes start..end (inclusive) into the open file at the same offset"""
+    offset = start
+    for attempt in range(DOWNLOAD_ATTEMPTS):
+        if attempt:
+            delay = 2 ** (attempt - 1)
+            print(f"Range {start}-{end} interrupted at byte {offset}, retrying in {delay}s")
+            time.sleep(delay)
+        
+        try:
+            with SESSION.get(url, headers={
+                'Range': f'bytes={offset}-{end}',
+                'Accept-Encoding': 'identity',  # Byte offsets must match the file
+            }, stream=True, timeout=300) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise Exception(f"Range request ignored by server: HTTP {response.status_code}")
+                
+                while chunk := response.raw.read(CHUNK_SIZE):
+                    written = 0
+                    while written < len(chunk):
+                        written += os.pwrite(fd, chunk[written:], offset + written)
+                    offset += len(chunk)
+        except DOWNLOAD_ERRORS as e:
+            if attempt == DOWNLOAD_ATTEMPTS - 1:
+                raise
+            print(f"Range download error: {str(e)}")
+            continue
+        
+        if offset > end:
+            return
+    
+    raise Exception(f"Incomplete range {start}-{end}: got {offset - start} bytes")
+
+def download_file_ranged(url, file_path, size):
+    """Download file using parallel HTTP Range requests"""
+    ranges = [
+        (start, min(start + RANGE_PART_SIZE, size) - 1)
+        for start in range(0, size, RANGE_PART_SIZE)
+    ]
     
-    with open(file_path, 'wb') as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            f.write(chunk)
+    fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+    try:
+        os.ftruncate(fd, size)
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_CONNECTIONS) as pool:
+            futures = [pool.submit(download_range, url, fd, start, end) for start, end in ranges]
+            try:
+                for future in futures:
+                    future.result()
+            except Exception:
+                pool.shutdown(cancel_futures=True)
+                raise
+    finally:
+        os.close(fd)
     
     return file_path
 
+def download_file(url, file_path, remote=None):
+    """Download file from URL to local path, reusing a probe_download() result if given"""
+    final_url, size, supports_ranges = remote or probe_download(url)
+    if supports_ranges and size > RANGE_PART_SIZE and DOWNLOAD_CONNECTIONS > 1:
+        print(f"Downloading {size} bytes over {DOWNLOAD_CONNECTIONS} connections")
+        return download_file_ranged(final_url, file_path, size)
+    
+    for attempt in range(DOWNLOAD_ATTEMPTS):
+        resume = os.path.getsize(file_path) if attempt and os.path.exists(file_path) else 0
+        headers = {'Accept-Encoding': 'identity'}  # Byte offsets must match the file
+        if resume:
+            headers['Range'] = f'bytes={resume}-'
+        
+        try:
+            with SESSION.get(url, headers=headers, stream=True, timeout=300) as response:
+                response.raise_for_status()
+                if resume and response.status_code != 206:
+                    print("Server ignored range request, restarting download")
+                    resume = 0
+                
+                response.raw.decode_content = True
+                with open(file_path, 'ab' if resume else 'wb', buffering=CHUNK_SIZE) as f:
+                    shutil.copyfileobj(SizeLimitedReader(response.raw, resume), f, length=CHUNK_SIZE)
+            
+            return file_path
+            
+        except DOWNLOAD_ERRORS as e:
+            if attempt == DOWNLOAD_ATTEMPTS - 1:
+                raise
+            delay = 2 ** attempt
+            print(f"Download interrupted ({str(e)}), retrying in {delay}s")
+            time.sleep(delay)
+
+def probe_audio_codec(input_path):
+    """Return the codec name of the first audio stream, or None if unknown"""
+    try:
+        result = subprocess.run([
+            'ffprobe', '-v', 'error',
+            '-select_streams', 'a:0',
+            '-show_entries', 'stream=codec_name',
+            '-of', 'csv=p=0',
+            input_path
+        ], check=True, capture_output=True, text=True)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+    
+    return result.stdout.strip() or None
+
+def probe_duration(input_path):
+    """Return the media duration in seconds, or None if unknown"""
+    try:
+        result = subprocess.run([
+            'ffprobe', '-v', 'error',
+            '-show_entries', 'format=duration',
+            '-of', 'csv=p=0',
+            input_path
+        ], check=True, capture_output=True, text=True)
+        return float(result.stdout.strip())
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return None
+
+def remux_audio(input_path, output_path):
+    """Copy the audio track out of the video without re-encoding it"""
+    codec = probe_audio_codec(input_path)
+    if codec not in COPY_CODECS:
+        return None
+    
+    copy_path = os.path.splitext(output_path)[0] + COPY_CODECS[codec]
+    try:
+        subprocess.run([
+            *FFMPEG_CMD, '-i', input_path,
+            '-vn',  # No video
+            '-c:a', 'copy',
+            '-y',  # Overwrite output file
+            copy_path
+        ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, errors='replace')
+    except subprocess.CalledProcessError as e:
+        print(f"FFmpeg remux failed, re-encoding instead: {e.stderr}")
+        copy_size = None
+    else:
+        copy_size = os.path.getsize(copy_path)
+    
+    if copy_size is None or copy_size > WHISPER_MAX_BYTES:
+        if copy_size is not None:
+            # The source bitrate is too high to upload as-is; a re-encode is smaller
+            print(f"Remuxed {codec} audio exceeds Whisper limit, re-encoding instead")
+        if copy_path != output_path and os.path.exists(copy_path):
+            os.unlink(copy_path)
+        return None
+    
+    print(f"Remuxed {codec} audio without re-encoding: {copy_path}")
+    return copy_path
+
 def convert_to_audio(input_path, output_path):
     """Convert video to audio format supported by Whisper"""
+    # The input is a downloaded, seekable file, so it can be probed and the
+    # encoder skipped entirely when the audio is already usable
+    copy_path = remux_audio(input_path, output_path)
+    if copy_path:
+        return copy_path
+    
     try:
-        # Try to convert to MP3 using ffmpeg
+        # Try to convert to Opus using ffmpeg
         subprocess.run([
-            'ffmpeg', '-i', input_path, 
-            '-vn',  # No video
-            '-acodec', 'mp3', 
-            '-ab', '192k', 
-            '-ar', '22050', 
+            *FFMPEG_CMD, '-i', input_path,
+            *AUDIO_ARGS,
             '-y',  # Overwrite output file
             output_path
-        ], check=True, capture_output=True, text=True)
+        ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, errors='replace')
         
         print(f"Successfully converted to audio: {output_path}")
         return output_path
@@ -71,37 +368,227 @@ def convert_to_audio(input_path, output_path):
         print("FFmpeg not found, trying original file")
         return input_path
 
+def stream_to_audio(url, output_path):
+    """Pipe the download through ffmpeg; returns short audio as a BytesIO, else spills it to output_path"""
+    with SESSION.get(url, headers={
+        'Accept-Encoding': 'identity',  # Resume offsets must match the file
+    }, stream=True, timeout=300) as response:
+        response.raise_for_status()
+        
+        with tempfile.TemporaryFile() as stderr_file:
+            proc = subprocess.Popen([
+                *FFMPEG_CMD, '-xerror', '-i', 'pipe:0',
+                *AUDIO_ARGS,
+                '-f', AUDIO_FORMAT,
+                'pipe:1'
+            ], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr_file)
+            
+            # Feed ffmpeg from a separate thread while this one drains its output.
+            # A dropped connection is resumed with a Range request from the bytes
+            # already fed, so nothing is fetched twice and nothing touches disk
+            feed_errors = []
+            def feed():
+                reader = SizeLimitedReader(response.raw)
+                resumed = []
+                resume_refused = False
+                try:
+                    for attempt in range(DOWNLOAD_ATTEMPTS):
+                        try:
+                            if attempt:
+                                delay = 2 ** (attempt - 1)
+                                print(f"Stream interrupted at byte {reader.total}, resuming in {delay}s")
+                                time.sleep(delay)
+                                retry = SESSION.get(url, headers={
+                                    'Range': f'bytes={reader.total}-',
+                                    'Accept-Encoding': 'identity',
+                                }, stream=True, timeout=300)
+                                resumed.append(retry)
+                                retry.raise_for_status()
+                                if retry.status_code != 206:
+                                    # ffmpeg can't restart mid-pipe; the caller falls back to a download
+                                    resume_refused = True
+                                    raise requests.ConnectionError(f"Range resume ignored by server: HTTP {retry.status_code}")
+                                retry.raw.decode_content = True
+                                reader = SizeLimitedReader(retry.raw, reader.total)
+                            
+                            shutil.copyfileobj(reader, proc.stdin, length=CHUNK_SIZE)
+                            break
+                        except DOWNLOAD_ERRORS as e:
+                            if resume_refused or attempt == DOWNLOAD_ATTEMPTS - 1:
+                                raise
+                            print(f"Stream download error: {str(e)}")
+                except BrokenPipeError:
+                    # ffmpeg exited early; its exit status below says why
+                    pass
+                except Exception as e:
+                    feed_errors.append(e)
+                    proc.kill()
+                finally:
+                    for retry in resumed:
+                        retry.close()
+                    try:
+                        proc.stdin.close()
+                    except BrokenPipeError:
+                        pass
+            
+            response.raw.decode_content = True
+            feeder = threading.Thread(target=feed, daemon=True)
+            feeder.start()
+            
+            audio = io.BytesIO()
+            audio_size = 0
+            buffer = bytearray(CHUNK_SIZE)
+            view = memoryview(buffer)
+            try:
+                while n := proc.stdout.readinto(buffer):
+                    if isinstance(audio, io.BytesIO) and audio_size + n > MAX_IN_MEMORY_AUDIO_BYTES:
+                        spill = open(output_path, 'wb')
+                        spill.write(audio.getbuffer())
+                        audio = spill
+                    audio.write(view[:n])
+                    audio_size += n
+            except Exception:
+                proc.kill()
+                raise
+            finally:
+                feeder.join()
+                proc.wait()
+                if not isinstance(audio, io.BytesIO):
+                    audio.close()
+            
+            if feed_errors:
+                raise feed_errors[0]
+            
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode(errors='replace')
+            if proc.returncode != 0:
+                raise subprocess.CalledProcessError(proc.returncode, proc.args, stderr=stderr)
+            
+            # An MP4 with its index at the end can make ffmpeg give up on every
+            # packet yet still exit 0, leaving only container headers
+            if audio_size < MIN_AUDIO_BYTES:
+                raise subprocess.CalledProcessError(
+                    proc.returncode, proc.args,
+                    stderr=f"{stderr}Streamed audio is only {audio_size} bytes"
+                )
+    
+    if not isinstance(audio, io.BytesIO):
+        print(f"Successfully streamed to audio: {output_path}")
+        return output_path
+    
+    print(f"Successfully streamed to audio: {audio_size} bytes in memory")
+    audio.seek(0)
+    return audio
+
+def upload_to_whisper(file_name, audio_file, api_key):
+    """Post an open audio file to the Whisper API and return the transcript text"""
+    # Check file size (Whisper has 25MB limit)
+    file_size = audio_file.seek(0, os.SEEK_END)
+    audio_file.seek(0)
+    if file_size > WHISPER_MAX_BYTES:
+        raise Exception(f"File too large for Whisper API: {file_size / (1024*1024):.1f}MB (max 25MB)")
+    
+    # Stream the multipart body from the file instead of building it in memory
+    mime_type = mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+    encoder = MultipartEncoder(fields={
+        'model': 'whisper-1',
+        'response_format': 'json',
+        'file': (file_name, audio_file, mime_type),
+    })
+    response = SESSION.post(WHISPER_URL, data=encoder, headers={
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': encoder.content_type,
+    }, timeout=600)
+    
+    if not response.ok:
+        raise Exception(f"HTTP {response.status_code}: {response.text}")
+    
+    return response.json()['text']
+
 def transcribe_with_whisper(file_path, api_key):
     """Transcribe audio file using OpenAI Whisper"""
     try:
-        openai.api_key = api_key
-        
-        # Check file size (Whisper has 25MB limit)
-        file_size = os.path.getsize(file_path)
-        if file_size > 25 * 1024 * 1024:  # 25MB
-            raise Exception(f"File too large for Whisper API: {file_size / (1024*1024):.1f}MB (max 25MB)")
-        
         with open(file_path, 'rb') as audio_file:
-            transcript = openai.Audio.transcribe(
-                model="whisper-1",
-                file=audio_file,
-                response_format="json"
-            )
-        
-        return transcript['text']
-        
+            return upload_to_whisper(os.path.basename(file_path), audio_file, api_key)
     except Exception as e:
         raise Exception(f"Whisper transcription failed: {str(e)}")
 
+def split_audio(input_path, output_dir):
+    """Split audio into SEGMENT_SECONDS pieces without re-encoding, returned in order"""
+    ext = os.path.splitext(input_path)[1]
+    subprocess.run([
+        *FFMPEG_CMD, '-i', input_path,
+        '-f', 'segment',
+        '-segment_time', str(SEGMENT_SECONDS),
+        '-reset_timestamps', '1',
+        '-c', 'copy',
+        os.path.join(output_dir, f'seg_%03d{ext}')
+    ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, errors='replace')
+    
+    return sorted(
+        os.path.join(output_dir, name)
+        for name in os.listdir(output_dir)
+        if name.startswith('seg_')
+    )
+
+def transcribe_audio(file_path, api_key, work_dir):
+    """Transcribe audio, splitting long files into concurrently transcribed segments in work_dir"""
+    if isinstance(file_path, io.BytesIO):
+        # Short streamed audio that never touched disk
+        try:
+            return upload_to_whisper(f'audio.{AUDIO_FORMAT}', file_path, api_key)
+        except Exception as e:
+            raise Exception(f"Whisper transcription failed: {str(e)}")
+    
+    duration = probe_duration(file_path)
+    if duration is None or duration <= SEGMENT_SECONDS:
+        return transcribe_with_whisper(file_path, api_key)
+    
+    segment_dir = os.path.join(work_dir, 'segments')
+    os.makedirs(segment_dir, exist_ok=True)
+    try:
+        segments = split_audio(file_path, segment_dir)
+    except subprocess.CalledProcessError as e:
+        print(f"FFmpeg segmenting failed, transcribing whole file: {e.stderr}")
+        return transcribe_with_whisper(file_path, api_key)
+    
+    print(f"Transcribing {duration:.0f}s of audio as {len(segments)} segments")
+    with ThreadPoolExecutor(max_workers=WHISPER_CONNECTIONS) as pool:
+        futures = [pool.submit(transcribe_with_whisper, path, api_key) for path in segments]
+        try:
+            texts = [future.result() for future in futures]
+        except Exception:
+            # Don't spend more Whisper calls on a job that has already failed
+            pool.shutdown(cancel_futures=True)
+            raise
+    
+    return ' '.join(text.strip() for text in texts)
+
 def send_webhook(callback_url, data):
     """Send results back to n8n webhook"""
     try:
-        response = requests.post(callback_url, json=data, timeout=30)
+        response = SESSION.post(callback_url, json=data, timeout=30)
         response.raise_for_status()
         print(f"Webhook sent successfully: {response.status_code}")
     except Exception as e:
         print(f"Webhook error: {str(e)}")
 
+def send_cached_transcript(callback_url, row_id, file_id):
+    """Send the success webhook from a cached transcript; returns False on a cache miss"""
+    transcript = TRANSCRIPT_CACHE.get(file_id)
+    if transcript is None:
+        return False
+    
+    print(f"Using cached transcript for file ID: {file_id}")
+    send_webhook(callback_url, {
+        "status": "success",
+        "row_id": row_id,
+        "transcript": transcript,
+        "file_id": file_id
+    })
+    print(f"Success webhook sent for row_id: {row_id}")
+    return True
+
 def process_video_async(google_drive_url, callback_url, row_id, openai_api_key):
     """Process video in background thread"""
     try:
@@ -114,30 +601,50 @@ def process_video_async(google_drive_url, callback_url, row_id, openai_api_key):
         
         print(f"Extracted file ID: {file_id}")
         
+        # Reuse a transcript finished while this job was queued
+        if send_cached_transcript(callback_url, row_id, file_id):
+            return
+        
         # Get direct download URL
         download_url = get_download_url(file_id)
         
-        # Create temporary files
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.tmp') as temp_file:
-            temp_path = temp_file.name
-        
-        audio_path = temp_path.replace('.tmp', '.mp3')
+        # Reject oversize files before spending any download or ffmpeg time
+        remote = probe_download(download_url)
+        check_video_size(remote[1])
         
-        try:
-            # Download file
-            print(f"Downloading file from Google Drive...")
-            download_file(download_url, temp_path)
-            print(f"Download completed: {os.path.getsize(temp_path)} bytes")
+        # Keep every intermediate file in per-job directories that are
+        # removed however the job ends; only the small audio files use tmpfs
+        with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as video_dir, \
+                tempfile.TemporaryDirectory(dir=get_temp_dir(), ignore_cleanup_errors=True) as work_dir:
+            temp_path = os.path.join(video_dir, 'video.tmp')
+            audio_path = os.path.join(work_dir, f'audio.{AUDIO_FORMAT}')
             
-            # Convert to audio format
-            print(f"Converting to audio format...")
-            final_audio_path = convert_to_audio(temp_path, audio_path)
+            try:
+                # Download and convert in a single pass
+                print(f"Streaming file from Google Drive into ffmpeg...")
+                final_audio_path = stream_to_audio(download_url, audio_path)
+            except (subprocess.CalledProcessError, FileNotFoundError, *DOWNLOAD_ERRORS) as e:
+                # Inputs that need seeking (e.g. MP4 with its index at the end)
+                # can't be demuxed from a pipe, and a stream that couldn't be
+                # resumed can't be restarted mid-pipe, so fall back to a full download
+                print(f"Streaming conversion failed, downloading instead: {getattr(e, 'stderr', None) or str(e)}")
+                
+                # Download file
+                print(f"Downloading file from Google Drive...")
+                download_file(download_url, temp_path, remote)
+                print(f"Download completed: {os.path.getsize(temp_path)} bytes")
+                
+                # Convert to audio format
+                print(f"Converting to audio format...")
+                final_audio_path = convert_to_audio(temp_path, audio_path)
             
             # Transcribe with Whisper
             print(f"Starting transcription...")
-            transcript = transcribe_with_whisper(final_audio_path, openai_api_key)
+            transcript = transcribe_audio(final_audio_path, openai_api_key, work_dir)
             print(f"Transcription completed: {len(transcript)} characters")
             
+            TRANSCRIPT_CACHE.set(file_id, transcript, expire=TRANSCRIPT_CACHE_TTL)
+            
             # Send success webhook
             webhook_data = {
                 "status": "success",
@@ -148,15 +655,6 @@ def process_video_async(google_drive_url, callback_url, row_id, openai_api_key):
             
             send_webhook(callback_url, webhook_data)
             print(f"Success webhook sent for row_id: {row_id}")
-            
-        finally:
-            # Clean up temp files
-            for file_path in [temp_path, audio_path]:
-                try:
-                    if os.path.exists(file_path):
-                        os.unlink(file_path)
-                except:
-                    pass
         
     except Exception as e:
         print(f"Error processing video: {str(e)}")
@@ -194,13 +692,36 @@ def process_video():
         print(f"Google Drive URL: {google_drive_url}")
         print(f"Callback URL: {callback_url}")
         
-        # Start processing in background thread
-        thread = threading.Thread(
-            target=process_video_async,
-            args=(google_drive_url, callback_url, row_id, openai_api_key)
-        )
-        thread.daemon = True  # Thread will die when main program exits
-        thread.start()
+        # Answer retries of an already transcribed file without taking a job
+        # slot; the webhook goes out once the response has been sent
+        file_id = extract_google_drive_file_id(google_drive_url)
+        if file_id and file_id in TRANSCRIPT_CACHE:
+            response = jsonify({
+                "status": "processing",
+                "message": "Cached transcript found",
+                "row_id": row_id
+            })
+            response.call_on_close(lambda: send_cached_transcript(callback_url, row_id, file_id))
+            return response
+        
+        # Reserve a slot, rejecting the request if the backlog is full
+        try:
+            PENDING_JOBS.put_nowait(row_id)
+        except queue.Full:
+            print(f"Job queue full, rejecting row_id: {row_id}")
+            return jsonify({"error": "Too many videos being processed, try again later"}), 429
+        
+        # Start processing on the worker pool
+        try:
+            future = EXECUTOR.submit(
+                process_video_async,
+                google_drive_url, callback_url, row_id, openai_api_key
+            )
+        except Exception:
+            # Never submitted, so the done callback won't free the slot
+            PENDING_JOBS.get_nowait()
+            raise
+        future.add_done_callback(lambda _: PENDING_JOBS.get_nowait())
         
         return jsonify({
             "status": "processing",
@@ -212,6 +733,7 @@ def process_video():
         print(f"Error in process_video endpoint: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+# Local development only; production runs under gunicorn (see render.yaml)
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)